@@ -0,0 +1,384 @@
+"""
+Technical indicator library
+
+Every indicator returns its full series. Indicators are built from shared
+NumPy kernels, and intermediate results (true range, EMAs, rolling means) are
+computed once per bar set and reused across indicators. Complete results are
+memoized by symbol, interval, last bar and parameters.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Tuple, Hashable
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS: Dict[str, float] = {
+    "rsiPeriod": 14,
+    "macdFast": 12,
+    "macdSlow": 26,
+    "macdSignal": 9,
+    "atrPeriod": 14,
+    "bollingerPeriod": 20,
+    "bollingerStdDev": 2,
+    "stochPeriod": 14,
+    "stochSmooth": 3,
+    "adxPeriod": 14,
+    "supertrendPeriod": 10,
+    "supertrendMultiplier": 3,
+}
+
+
+# NumPy kernels
+def ewm(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Recursive exponential moving average seeded with the first valid value"""
+    result = np.full(values.shape, np.nan)
+    valid = np.flatnonzero(np.isfinite(values))
+    if valid.size == 0:
+        return result
+
+    start = valid[0]
+    current = values[start]
+    result[start] = current
+    for i in range(start + 1, len(values)):
+        value = values[i]
+        if value == value:  # skip NaN gaps without resetting the average
+            current += alpha * (value - current)
+        result[i] = current
+    return result
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average; the first window - 1 values are NaN"""
+    result = np.full(values.shape, np.nan)
+    if window <= 0 or len(values) < window:
+        return result
+    result[window - 1:] = sliding_window_view(values, window).mean(axis=1)
+    return result
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling sample standard deviation (ddof=1, as pandas)"""
+    result = np.full(values.shape, np.nan)
+    if window <= 1 or len(values) < window:
+        return result
+    result[window - 1:] = sliding_window_view(values, window).std(axis=1, ddof=1)
+    return result
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    if window <= 0 or len(values) < window:
+        return result
+    result[window - 1:] = sliding_window_view(values, window).max(axis=1)
+    return result
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(values.shape, np.nan)
+    if window <= 0 or len(values) < window:
+        return result
+    result[window - 1:] = sliding_window_view(values, window).min(axis=1)
+    return result
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+class IndicatorKernels:
+    """Shared intermediates for one set of OHLCV bars
+
+    Each kernel result is computed once and reused by every indicator that
+    needs it, e.g. true range feeds ATR, ADX and SuperTrend.
+    """
+
+    def __init__(self, hist: pd.DataFrame):
+        self.open = hist["Open"].to_numpy(dtype=float)
+        self.high = hist["High"].to_numpy(dtype=float)
+        self.low = hist["Low"].to_numpy(dtype=float)
+        self.close = hist["Close"].to_numpy(dtype=float)
+        if "Volume" in hist.columns:
+            self.volume = hist["Volume"].to_numpy(dtype=float)
+        else:
+            self.volume = np.zeros(len(hist))
+        self._memo: Dict[Tuple[Hashable, ...], Any] = {}
+
+    def _cached(self, key: Tuple[Hashable, ...], compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def close_change(self) -> np.ndarray:
+        return self._cached(("close_change",), lambda: np.diff(self.close, prepend=np.nan))
+
+    def prev_close(self) -> np.ndarray:
+        return self._cached(("prev_close",), lambda: np.concatenate(([np.nan], self.close[:-1])))
+
+    def true_range(self) -> np.ndarray:
+        def compute():
+            prev_close = self.prev_close()
+            # The first bar has no previous close, so its range is high - low
+            return np.fmax(self.high - self.low, np.fmax(np.abs(self.high - prev_close), np.abs(self.low - prev_close)))
+        return self._cached(("true_range",), compute)
+
+    def ema(self, name: str, span: int) -> np.ndarray:
+        return self._cached(("ema", name, span), lambda: ewm(self.series(name), 2.0 / (span + 1)))
+
+    def wilder(self, name: str, period: int) -> np.ndarray:
+        return self._cached(("wilder", name, period), lambda: ewm(self.series(name), 1.0 / period))
+
+    def sma(self, name: str, window: int) -> np.ndarray:
+        return self._cached(("sma", name, window), lambda: rolling_mean(self.series(name), window))
+
+    def series(self, name: str) -> np.ndarray:
+        """Look up a raw or derived series by name"""
+        if name in ("open", "high", "low", "close", "volume"):
+            return getattr(self, name)
+        if name in self._named:
+            return self._cached(("series", name), lambda: self._named[name](self))
+        raise KeyError(f"Unknown series: {name}")
+
+    # Derived series that can be smoothed by name
+    _named = {
+        "true_range": lambda k: k.true_range(),
+        "gain": lambda k: np.where(k.close_change() > 0, k.close_change(), 0.0),
+        "loss": lambda k: np.where(k.close_change() < 0, -k.close_change(), 0.0),
+        "plus_dm": lambda k: k.directional_movement()[0],
+        "minus_dm": lambda k: k.directional_movement()[1],
+        "hl2": lambda k: (k.high + k.low) / 2.0,
+    }
+
+    def directional_movement(self) -> Tuple[np.ndarray, np.ndarray]:
+        def compute():
+            up_move = np.diff(self.high, prepend=np.nan)
+            down_move = -np.diff(self.low, prepend=np.nan)
+            plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+            minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+            if len(plus_dm):
+                plus_dm[0] = minus_dm[0] = np.nan
+            return plus_dm, minus_dm
+        return self._cached(("directional_movement",), compute)
+
+
+# Indicators
+def rsi(k: IndicatorKernels, period: int = 14) -> np.ndarray:
+    """RSI from simple averages of gains and losses"""
+    avg_gain = k.sma("gain", period)
+    avg_loss = k.sma("loss", period)
+    rs = _safe_divide(avg_gain, avg_loss)
+    values = 100.0 - 100.0 / (1.0 + rs)
+    values = np.where((avg_loss == 0) & np.isfinite(avg_gain), 100.0, values)
+    # The first bar has no change, so the window starts one bar later
+    values[:period] = np.nan
+    return values
+
+
+def macd(k: IndicatorKernels, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """MACD line, 9-EMA signal line and histogram"""
+    line = k.ema("close", fast) - k.ema("close", slow)
+    signal_line = ewm(line, 2.0 / (signal + 1))
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+def atr(k: IndicatorKernels, period: int = 14) -> np.ndarray:
+    """ATR as a simple moving average of true range"""
+    return k.sma("true_range", period)
+
+
+def bollinger_bands(k: IndicatorKernels, period: int = 20, std_dev: float = 2) -> Dict[str, np.ndarray]:
+    middle = k.sma("close", period)
+    std = rolling_std(k.close, period)
+    return {"upper": middle + std_dev * std, "middle": middle, "lower": middle - std_dev * std}
+
+
+def stochastic(k: IndicatorKernels, period: int = 14, smooth: int = 3) -> Dict[str, np.ndarray]:
+    """Stochastic oscillator %K and its %D moving average"""
+    highest = rolling_max(k.high, period)
+    lowest = rolling_min(k.low, period)
+    percent_k = 100.0 * _safe_divide(k.close - lowest, highest - lowest)
+    return {"k": percent_k, "d": rolling_mean(percent_k, smooth)}
+
+
+def adx(k: IndicatorKernels, period: int = 14) -> Dict[str, np.ndarray]:
+    """Average Directional Index with +DI and -DI (Wilder smoothing)"""
+    smoothed_tr = k.wilder("true_range", period)
+    plus_di = 100.0 * _safe_divide(k.wilder("plus_dm", period), smoothed_tr)
+    minus_di = 100.0 * _safe_divide(k.wilder("minus_dm", period), smoothed_tr)
+    dx = 100.0 * _safe_divide(np.abs(plus_di - minus_di), plus_di + minus_di)
+    values = ewm(dx, 1.0 / period)
+    # ADX is a smoothing of DX, so it is not meaningful before two periods
+    values[:min(2 * period - 1, len(values))] = np.nan
+    return {"adx": values, "plusDI": plus_di, "minusDI": minus_di}
+
+
+def supertrend(k: IndicatorKernels, period: int = 10, multiplier: float = 3) -> Dict[str, np.ndarray]:
+    """SuperTrend line and direction (1 for uptrend, -1 for downtrend)"""
+    band_atr = atr(k, period)
+    hl2 = k.series("hl2")
+    basic_upper = hl2 + multiplier * band_atr
+    basic_lower = hl2 - multiplier * band_atr
+
+    n = len(k.close)
+    line = np.full(n, np.nan)
+    direction = np.full(n, np.nan)
+    upper = basic_upper.copy()
+    lower = basic_lower.copy()
+
+    start = np.flatnonzero(np.isfinite(band_atr))
+    if start.size == 0:
+        return {"supertrend": line, "direction": direction}
+
+    first = start[0]
+    direction[first] = 1.0
+    line[first] = lower[first]
+    for i in range(first + 1, n):
+        # Bands only tighten while price stays on the same side of them
+        if basic_upper[i] > upper[i - 1] and k.close[i - 1] <= upper[i - 1]:
+            upper[i] = upper[i - 1]
+        if basic_lower[i] < lower[i - 1] and k.close[i - 1] >= lower[i - 1]:
+            lower[i] = lower[i - 1]
+
+        if direction[i - 1] > 0:
+            direction[i] = -1.0 if k.close[i] < lower[i] else 1.0
+        else:
+            direction[i] = 1.0 if k.close[i] > upper[i] else -1.0
+        line[i] = lower[i] if direction[i] > 0 else upper[i]
+
+    return {"supertrend": line, "direction": direction}
+
+
+def obv(k: IndicatorKernels) -> np.ndarray:
+    """On-Balance Volume"""
+    signed_volume = np.sign(np.nan_to_num(k.close_change())) * k.volume
+    return np.cumsum(signed_volume)
+
+
+def vwap(k: IndicatorKernels) -> np.ndarray:
+    """Cumulative VWAP over the bars, falling back to close without volume"""
+    cumulative_volume = np.cumsum(k.volume)
+    values = _safe_divide(np.cumsum(k.close * k.volume), cumulative_volume)
+    return np.where(np.isfinite(values), values, k.close)
+
+
+# Keys returned by compute_indicators, in response order
+INDICATOR_NAMES = (
+    "rsi", "macd", "macdSignal", "macdHistogram", "atr",
+    "bollingerUpper", "bollingerMiddle", "bollingerLower",
+    "stochK", "stochD", "adx", "plusDI", "minusDI",
+    "supertrend", "supertrendDirection", "obv", "vwap",
+)
+
+
+def drop_missing_bars(hist: pd.DataFrame) -> pd.DataFrame:
+    """Drop bars without a close, e.g. the empty last intraday row yfinance returns"""
+    if hist["Close"].isna().any():
+        return hist.dropna(subset=["Close"])
+    return hist
+
+
+def compute_indicators(hist: pd.DataFrame, params: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+    """Compute every indicator series for a set of OHLCV bars
+
+    Bars without a close are dropped first, so series align with
+    drop_missing_bars(hist).
+    """
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    k = IndicatorKernels(drop_missing_bars(hist))
+
+    macd_values = macd(k, int(p["macdFast"]), int(p["macdSlow"]), int(p["macdSignal"]))
+    bands = bollinger_bands(k, int(p["bollingerPeriod"]), p["bollingerStdDev"])
+    stoch = stochastic(k, int(p["stochPeriod"]), int(p["stochSmooth"]))
+    adx_values = adx(k, int(p["adxPeriod"]))
+    trend = supertrend(k, int(p["supertrendPeriod"]), p["supertrendMultiplier"])
+
+    return {
+        "rsi": rsi(k, int(p["rsiPeriod"])),
+        "macd": macd_values["macd"],
+        "macdSignal": macd_values["signal"],
+        "macdHistogram": macd_values["histogram"],
+        "atr": atr(k, int(p["atrPeriod"])),
+        "bollingerUpper": bands["upper"],
+        "bollingerMiddle": bands["middle"],
+        "bollingerLower": bands["lower"],
+        "stochK": stoch["k"],
+        "stochD": stoch["d"],
+        "adx": adx_values["adx"],
+        "plusDI": adx_values["plusDI"],
+        "minusDI": adx_values["minusDI"],
+        "supertrend": trend["supertrend"],
+        "supertrendDirection": trend["direction"],
+        "obv": obv(k),
+        "vwap": vwap(k),
+    }
+
+
+def _json_array(values: np.ndarray, digits: int = 2) -> list:
+    """Round a series for JSON, mapping NaN to None"""
+    rounded = np.round(values, digits).astype(object)
+    rounded[~np.isfinite(values)] = None
+    return rounded.tolist()
+
+
+def build_payload(series: Dict[str, np.ndarray], hist: pd.DataFrame, digits: int = 2) -> Dict[str, Any]:
+    """JSON-ready latest values, timestamps and full series"""
+    latest = {name: _json_array(values[-1:], digits)[0] if len(values) else None for name, values in series.items()}
+    return {
+        "latest": latest,
+        "timestamps": hist.index.as_unit("ms").asi8.tolist(),
+        "series": {name: _json_array(values, digits) for name, values in series.items()}
+    }
+
+
+class IndicatorCache:
+    """LRU memo of indicator results keyed by symbol, interval, last bar and params"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(symbol: str, interval: str, hist: pd.DataFrame, params: Optional[Dict[str, float]] = None) -> Tuple[Hashable, ...]:
+        # The last bar's close and volume are part of the key because an
+        # intraday bar keeps updating until it closes
+        last_bar = hist.index[-1] if len(hist) else None
+        last_close = float(hist["Close"].iloc[-1]) if len(hist) else None
+        last_volume = float(hist["Volume"].iloc[-1]) if len(hist) and "Volume" in hist.columns else None
+        merged = {**DEFAULT_PARAMS, **(params or {})}
+        return (symbol, interval, len(hist), last_bar, last_close, last_volume, tuple(sorted(merged.items())))
+
+    def _entry(self, symbol: str, interval: str, hist: pd.DataFrame,
+               params: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        hist = drop_missing_bars(hist)
+        key = self.make_key(symbol, interval, hist, params)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        entry = {"hist": hist, "series": compute_indicators(hist, params), "payload": None}
+        self._entries[key] = entry
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def get_or_compute(self, symbol: str, interval: str, hist: pd.DataFrame,
+                       params: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+        """Indicator series aligned with drop_missing_bars(hist)"""
+        return self._entry(symbol, interval, hist, params)["series"]
+
+    def get_payload(self, symbol: str, interval: str, hist: pd.DataFrame,
+                    params: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """JSON-ready payload, built once per memoized result"""
+        entry = self._entry(symbol, interval, hist, params)
+        if entry["payload"] is None:
+            entry["payload"] = build_payload(entry["series"], entry["hist"])
+        return entry["payload"]
@@ -7,11 +7,19 @@ import pandas as pd
 import numpy as np
 import asyncio
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Dict, Optional, Any
 from pydantic import BaseModel
 import logging
 
+from indicators import IndicatorCache, INDICATOR_NAMES, drop_missing_bars
+from options_analytics import OptionsAnalyticsService, LocalFileChainProvider, SyntheticChainProvider, ChainNotFoundError
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; v2 clients fall back to JSON frames
+    msgpack = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -27,6 +35,10 @@ app = FastAPI(
 allowed_origins_env = os.getenv("ALLOWED_ORIGINS", "http://localhost:4028,http://localhost:3000,http://localhost:5173")
 allowed_origins = [origin.strip() for origin in allowed_origins_env.split(",") if origin.strip()]
 
+# WebSocket streaming settings
+WS_UPDATE_INTERVAL = float(os.getenv("WS_UPDATE_INTERVAL", "5"))
+WS_PROTOCOL_VERSION = 2
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -47,6 +59,11 @@ class QuoteRequest(BaseModel):
 class TechnicalIndicatorsRequest(BaseModel):
     symbol: str
     period: str = "1mo"
+    interval: str = "1d"
+
+class OptionsAnalyticsRequest(BaseModel):
+    symbol: str = "BANKNIFTY"
+    expiry: Optional[date] = None
 
 # Global WebSocket connections for real-time updates
 class ConnectionManager:
@@ -76,7 +93,9 @@ manager = ConnectionManager()
 class YahooFinanceService:
     def __init__(self):
         self.cache = {}
-        self.cache_ttl = 30  # seconds
+        self.cache_ttl = int(os.getenv("YF_CACHE_TTL", "30"))  # seconds
+        self.cache_max_entries = 64
+        self.indicator_cache = IndicatorCache()
 
     def get_ticker(self, symbol: str):
         """Get yfinance ticker object with proper symbol formatting"""
@@ -92,8 +111,35 @@ class YahooFinanceService:
         
         return yf.Ticker(formatted_symbol)
 
+    def get_history(self, symbol: str, period: str, interval: str) -> pd.DataFrame:
+        """Get historical bars, reusing responses younger than the cache TTL"""
+        key = (symbol, period, interval)
+        cached = self.cache.get(key)
+        if cached and (datetime.now() - cached[0]).total_seconds() < self.cache_ttl:
+            return cached[1]
+
+        hist = self.get_ticker(symbol).history(period=period, interval=interval)
+        if not hist.empty:
+            hist = drop_missing_bars(hist)
+            now = datetime.now()
+            # Evict expired responses, then the oldest ones beyond the size bound
+            self.cache = {
+                cache_key: entry for cache_key, entry in self.cache.items()
+                if cache_key != key and (now - entry[0]).total_seconds() < self.cache_ttl
+            }
+            while len(self.cache) >= self.cache_max_entries:
+                self.cache.pop(next(iter(self.cache)))
+            self.cache[key] = (now, hist)
+        return hist
+
     async def get_quote(self, symbol: str) -> Dict[str, Any]:
         """Get real-time quote data for a symbol"""
+        # yfinance calls block, so run them off the event loop; this also lets
+        # get_multiple_quotes fetch symbols concurrently
+        return await asyncio.to_thread(self._fetch_quote, symbol)
+
+    def _fetch_quote(self, symbol: str) -> Dict[str, Any]:
+        """Fetch a quote synchronously (blocking yfinance calls)"""
         try:
             ticker = self.get_ticker(symbol)
             info = ticker.info
@@ -139,18 +185,18 @@ class YahooFinanceService:
     async def get_chart_data(self, symbol: str, period: str = "1d", interval: str = "5m") -> List[Dict[str, Any]]:
         """Get historical chart data for a symbol"""
         try:
-            ticker = self.get_ticker(symbol)
-            hist = ticker.history(period=period, interval=interval)
+            hist = self.get_history(symbol, period, interval)
             
             if hist.empty:
                 return self._generate_fallback_chart_data(50)
 
+            # Full indicator series are computed once for all bars
+            series = self.indicator_cache.get_or_compute(symbol, interval, hist)
+            rsi = np.nan_to_num(series["rsi"], nan=50.0)
+            macd = np.nan_to_num(series["macd"], nan=0.0)
+
             chart_data = []
-            for index, row in hist.iterrows():
-                # Calculate technical indicators
-                rsi = self._calculate_rsi(hist, index)
-                macd = self._calculate_macd(hist, index)
-                
+            for i, (index, row) in enumerate(hist.iterrows()):
                 data_point = {
                     "time": index.strftime("%H:%M"),
                     "timestamp": int(index.timestamp() * 1000),
@@ -160,9 +206,9 @@ class YahooFinanceService:
                     "low": round(row['Low'], 2),
                     "close": round(row['Close'], 2),
                     "volume": int(row['Volume']) if 'Volume' in row else 0,
-                    "rsi": round(rsi, 2),
-                    "macd": round(macd, 2),
-                    "vwap": round(self._calculate_vwap(hist, index), 2)
+                    "rsi": round(float(rsi[i]), 2),
+                    "macd": round(float(macd[i]), 2),
+                    "vwap": round(float(series["vwap"][i]), 2)
                 }
                 chart_data.append(data_point)
 
@@ -187,37 +233,30 @@ class YahooFinanceService:
         
         return quotes
 
-    async def get_technical_indicators(self, symbol: str, period: str = "1mo") -> Dict[str, Any]:
-        """Get comprehensive technical indicators"""
+    async def get_technical_indicators(self, symbol: str, period: str = "1mo", interval: str = "1d") -> Dict[str, Any]:
+        """Get comprehensive technical indicators with their full series"""
         try:
-            ticker = self.get_ticker(symbol)
-            hist = ticker.history(period=period, interval="1d")
+            hist = self.get_history(symbol, period, interval)
             
             if hist.empty:
-                return self._generate_fallback_indicators()
+                return self._generate_fallback_indicators(symbol, interval)
+
+            # Rounded, JSON-ready series are memoized alongside the indicators
+            payload = self.indicator_cache.get_payload(symbol, interval, hist)
 
-            # Calculate various technical indicators
-            rsi = self._calculate_rsi(hist, len(hist) - 1)
-            macd = self._calculate_macd(hist, len(hist) - 1)
-            atr = self._calculate_atr(hist)
-            bollinger_bands = self._calculate_bollinger_bands(hist)
-            
             return {
                 "symbol": symbol,
-                "rsi": round(rsi, 2),
-                "macd": round(macd, 2),
-                "macdSignal": round(macd * 0.9, 2),  # Simplified signal line
-                "atr": round(atr, 2),
-                "bollingerUpper": round(bollinger_bands['upper'], 2),
-                "bollingerMiddle": round(bollinger_bands['middle'], 2),
-                "bollingerLower": round(bollinger_bands['lower'], 2),
+                "interval": interval,
                 "volume": int(hist['Volume'].iloc[-1]) if 'Volume' in hist.columns else 0,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now().isoformat(),
+                **payload["latest"],
+                "timestamps": payload["timestamps"],
+                "series": payload["series"]
             }
 
         except Exception as e:
             logger.error(f"Error fetching technical indicators for {symbol}: {str(e)}")
-            return self._generate_fallback_indicators()
+            return self._generate_fallback_indicators(symbol, interval)
 
     async def search_symbols(self, query: str) -> List[Dict[str, Any]]:
         """Search for symbols using yfinance"""
@@ -245,73 +284,6 @@ class YahooFinanceService:
             logger.error(f"Error searching symbols: {str(e)}")
             return []
 
-    # Technical indicator calculations
-    def _calculate_rsi(self, hist: pd.DataFrame, index: int, period: int = 14) -> float:
-        """Calculate RSI (Relative Strength Index)"""
-        if index < period:
-            return 50.0
-        
-        changes = hist['Close'].diff()
-        gains = changes.where(changes > 0, 0)
-        losses = -changes.where(changes < 0, 0)
-        
-        avg_gain = gains.rolling(window=period).mean().iloc[index]
-        avg_loss = losses.rolling(window=period).mean().iloc[index]
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
-
-    def _calculate_macd(self, hist: pd.DataFrame, index: int, fast: int = 12, slow: int = 26) -> float:
-        """Calculate MACD (Moving Average Convergence Divergence)"""
-        if index < slow:
-            return 0.0
-        
-        fast_ema = hist['Close'].ewm(span=fast).mean().iloc[index]
-        slow_ema = hist['Close'].ewm(span=slow).mean().iloc[index]
-        
-        return fast_ema - slow_ema
-
-    def _calculate_vwap(self, hist: pd.DataFrame, index: int) -> float:
-        """Calculate VWAP (Volume Weighted Average Price)"""
-        if 'Volume' not in hist.columns:
-            return hist['Close'].iloc[index]
-        
-        subset = hist.iloc[:index + 1]
-        vwap = (subset['Close'] * subset['Volume']).sum() / subset['Volume'].sum()
-        return vwap
-
-    def _calculate_atr(self, hist: pd.DataFrame, period: int = 14) -> float:
-        """Calculate ATR (Average True Range)"""
-        if len(hist) < 2:
-            return 0.0
-        
-        high_low = hist['High'] - hist['Low']
-        high_close = np.abs(hist['High'] - hist['Close'].shift())
-        low_close = np.abs(hist['Low'] - hist['Close'].shift())
-        
-        true_range = np.maximum(high_low, np.maximum(high_close, low_close))
-        atr = true_range.rolling(window=period).mean().iloc[-1]
-        
-        return atr
-
-    def _calculate_bollinger_bands(self, hist: pd.DataFrame, period: int = 20, std_dev: int = 2) -> Dict[str, float]:
-        """Calculate Bollinger Bands"""
-        if len(hist) < period:
-            return {"upper": 0, "middle": 0, "lower": 0}
-        
-        sma = hist['Close'].rolling(window=period).mean().iloc[-1]
-        std = hist['Close'].rolling(window=period).std().iloc[-1]
-        
-        return {
-            "upper": sma + (std_dev * std),
-            "middle": sma,
-            "lower": sma - (std_dev * std)
-        }
-
     # Fallback data generators
     def _generate_fallback_quote(self, symbol: str) -> Dict[str, Any]:
         """Generate fallback quote data when API fails"""
@@ -364,24 +336,52 @@ class YahooFinanceService:
         
         return data
 
-    def _generate_fallback_indicators(self) -> Dict[str, Any]:
-        """Generate fallback technical indicators when API fails"""
+    def _generate_fallback_indicators(self, symbol: str = "", interval: str = "1d") -> Dict[str, Any]:
+        """Generate fallback technical indicators when API fails
+
+        Matches the shape of a live response; the series are empty.
+        """
+        macd = round((np.random.random() - 0.5) * 40, 2)
+        macd_signal = round((np.random.random() - 0.5) * 35, 2)
+        stoch_k = round(np.random.random() * 100, 2)
         return {
+            "symbol": symbol,
+            "interval": interval,
+            "volume": np.random.randint(500000, 2000000),
+            "timestamp": datetime.now().isoformat(),
             "rsi": round(np.random.random() * 100, 2),
-            "macd": round((np.random.random() - 0.5) * 40, 2),
-            "macdSignal": round((np.random.random() - 0.5) * 35, 2),
+            "macd": macd,
+            "macdSignal": macd_signal,
+            "macdHistogram": round(macd - macd_signal, 2),
             "atr": round(np.random.random() * 200 + 50, 2),
             "bollingerUpper": 46000,
             "bollingerMiddle": 45250,
             "bollingerLower": 44500,
-            "volume": np.random.randint(500000, 2000000),
-            "timestamp": datetime.now().isoformat(),
+            "stochK": stoch_k,
+            "stochD": round(stoch_k * 0.9, 2),
+            "adx": round(np.random.random() * 50 + 10, 2),
+            "plusDI": round(np.random.random() * 40, 2),
+            "minusDI": round(np.random.random() * 40, 2),
+            "supertrend": 44800,
+            "supertrendDirection": 1.0,
+            "obv": 0.0,
+            "vwap": 45250,
+            "timestamps": [],
+            "series": {name: [] for name in INDICATOR_NAMES},
             "isFallback": True
         }
 
 # Initialize the service
 yf_service = YahooFinanceService()
 
+# Option chains come from a local file when configured, otherwise from the synthetic stand-in
+option_chain_file = os.getenv("OPTION_CHAIN_FILE")
+option_chain_symbol = os.getenv("OPTION_CHAIN_SYMBOL", "BANKNIFTY")
+options_service = OptionsAnalyticsService(
+    yf_service,
+    provider=LocalFileChainProvider(option_chain_file, option_chain_symbol) if option_chain_file else SyntheticChainProvider()
+)
+
 # API Routes
 @app.get("/")
 async def root():
@@ -428,12 +428,24 @@ async def get_technical_indicators(request: TechnicalIndicatorsRequest):
     try:
         indicators = await yf_service.get_technical_indicators(
             request.symbol, 
-            request.period
+            request.period,
+            request.interval
         )
         return JSONResponse(content=indicators)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/options/analytics")
+async def get_options_analytics(request: OptionsAnalyticsRequest):
+    """Get implied volatility, Greeks, max pain and IV surface for an option chain"""
+    try:
+        analytics = await options_service.get_analytics(request.symbol, request.expiry)
+        return JSONResponse(content=analytics)
+    except ChainNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/search/{query}")
 async def search_symbols(query: str):
     """Search for symbols"""
@@ -443,17 +455,229 @@ async def search_symbols(query: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class QuoteStreamSession:
+    """Per-connection state for the v2 quote protocol.
+
+    The first frame for a symbol carries a full snapshot of its quote; later
+    frames only carry the fields that changed since the last frame. Updates
+    for all subscribed symbols are batched into one frame per tick, and every
+    frame has a sequence number so clients can detect gaps and ask for a resync.
+    Per-quote fields in UNDIFFED_FIELDS are dropped; the frame carries one
+    timestamp instead, so unchanged quotes produce no frame at all.
+
+    Option chain subscriptions are recomputed on the same tick and sent as
+    full options_analytics frames.
+    """
+
+    UNDIFFED_FIELDS = ("timestamp",)
+
+    def __init__(self, websocket: WebSocket, encoding: str = "json", interval: float = WS_UPDATE_INTERVAL):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.interval = interval
+        self.symbols: Dict[str, None] = {}  # ordered set of subscribed symbols
+        self.last_sent: Dict[str, Dict[str, Any]] = {}
+        self.pending_snapshots: set = set()
+        self.option_subscriptions: Dict[str, Optional[date]] = {}
+        self.seq = 0
+        self._wake = asyncio.Event()
+
+    def subscribe(self, symbols: List[str]):
+        """Add symbols to the stream; each gets a snapshot on the next frame"""
+        for symbol in symbols:
+            self.symbols[symbol] = None
+            self.pending_snapshots.add(symbol)
+        self._wake.set()
+
+    def unsubscribe(self, symbols: List[str]):
+        """Remove symbols from the stream and forget their last sent state"""
+        for symbol in symbols:
+            self.symbols.pop(symbol, None)
+            self.last_sent.pop(symbol, None)
+            self.pending_snapshots.discard(symbol)
+
+    def subscribe_options(self, symbol: str, expiry: Optional[date] = None):
+        """Recompute option chain analytics for symbol on every tick"""
+        self.option_subscriptions[symbol] = expiry
+        self._wake.set()
+
+    def unsubscribe_options(self, symbol: str):
+        self.option_subscriptions.pop(symbol, None)
+
+    def request_resync(self, symbols: Optional[List[str]] = None):
+        """Resend full snapshots for the given symbols (all when omitted)"""
+        targets = symbols if symbols else list(self.symbols)
+        self.pending_snapshots.update(symbol for symbol in targets if symbol in self.symbols)
+        self._wake.set()
+
+    def build_frame(self, quotes: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Diff quotes against the last sent state and build a batch frame"""
+        snapshots = {}
+        deltas = {}
+        removed = {}
+
+        for quote in quotes:
+            symbol = quote.get("symbol")
+            # Skip symbols unsubscribed while their quote was being fetched
+            if symbol not in self.symbols:
+                continue
+            quote = {field: value for field, value in quote.items() if field not in self.UNDIFFED_FIELDS}
+
+            previous = self.last_sent.get(symbol)
+            if previous is None or symbol in self.pending_snapshots:
+                snapshots[symbol] = quote
+                self.pending_snapshots.discard(symbol)
+            else:
+                changed = {
+                    field: value for field, value in quote.items()
+                    if field not in previous or previous[field] != value
+                }
+                dropped = [field for field in previous if field not in quote]
+                if changed:
+                    deltas[symbol] = changed
+                if dropped:
+                    removed[symbol] = dropped
+
+            self.last_sent[symbol] = quote
+
+        if not (snapshots or deltas or removed):
+            return None
+
+        self.seq += 1
+        frame = {"type": "quote_batch", "seq": self.seq, "timestamp": datetime.now().isoformat()}
+        if snapshots:
+            frame["snapshots"] = snapshots
+        if deltas:
+            frame["deltas"] = deltas
+        if removed:
+            frame["removed"] = removed
+        return frame
+
+    async def send(self, message: Dict[str, Any]):
+        """Send a message using the negotiated encoding"""
+        if self.encoding == "msgpack":
+            await self.websocket.send_bytes(msgpack.packb(message, use_bin_type=True))
+        else:
+            await self.websocket.send_text(json.dumps(message, separators=(",", ":")))
+
+    async def send_options(self, symbol: str, expiry: Optional[date]):
+        """Recompute and send analytics for one option chain subscription"""
+        try:
+            analytics = await options_service.get_analytics(symbol, expiry)
+        except Exception as e:
+            # A chain that cannot be priced is dropped rather than retried every tick
+            self.option_subscriptions.pop(symbol, None)
+            await self.send({"type": "error", "message": f"Options analytics for {symbol} failed: {str(e)}"})
+            return
+
+        if symbol in self.option_subscriptions:
+            await self.send({"type": "options_analytics", "symbol": symbol, "data": analytics})
+
+    async def run(self):
+        """Fetch quotes for all subscribed symbols and send one frame per tick"""
+        try:
+            while True:
+                self._wake.clear()
+                if self.symbols:
+                    quotes = await yf_service.get_multiple_quotes(list(self.symbols))
+                    frame = self.build_frame(quotes)
+                    if frame:
+                        await self.send(frame)
+
+                for symbol, expiry in list(self.option_subscriptions.items()):
+                    await self.send_options(symbol, expiry)
+
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        except Exception as e:
+            # Tell the client the stream is dead rather than leaving it silent
+            logger.error(f"Error streaming quote batch: {str(e)}")
+            try:
+                await self.send({"type": "error", "message": f"Quote stream failed: {str(e)}"})
+                await self.websocket.close(code=1011)
+            except Exception:
+                pass
+
+
+def _message_symbols(message: Dict[str, Any]) -> List[str]:
+    """Read the symbol list from a v2 client message"""
+    symbols = message.get("symbols")
+    if symbols is None:
+        symbols = [message["symbol"]] if message.get("symbol") else []
+    return [symbol for symbol in symbols if isinstance(symbol, str) and symbol]
+
+
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
+    session: Optional[QuoteStreamSession] = None
+    stream_task: Optional[asyncio.Task] = None
     try:
         while True:
             # Keep connection alive and handle incoming messages
             data = await websocket.receive_text()
             message = json.loads(data)
-            
-            if message.get("type") == "subscribe":
+            message_type = message.get("type")
+
+            if message_type == "hello" and session is not None:
+                # Already negotiated; repeat the agreed settings
+                await websocket.send_text(json.dumps({
+                    "type": "hello",
+                    "protocol": WS_PROTOCOL_VERSION,
+                    "encoding": session.encoding,
+                    "interval": session.interval
+                }))
+
+            elif message_type == "hello":
+                # Negotiate the v2 delta protocol; the reply is always JSON text
+                requested = message.get("protocol", 1)
+                if isinstance(requested, bool) or not isinstance(requested, int):
+                    await websocket.send_text(json.dumps({
+                        "type": "error",
+                        "message": f"Invalid protocol version: {requested!r}"
+                    }))
+                    continue
+
+                encoding = message.get("encoding", "json")
+                if encoding == "msgpack" and msgpack is None:
+                    encoding = "json"
+                elif encoding not in ("json", "msgpack"):
+                    encoding = "json"
+                protocol = min(requested, WS_PROTOCOL_VERSION)
+                await websocket.send_text(json.dumps({
+                    "type": "hello",
+                    "protocol": protocol,
+                    "encoding": encoding,
+                    "interval": WS_UPDATE_INTERVAL
+                }))
+                if protocol >= 2:
+                    session = QuoteStreamSession(websocket, encoding)
+                    stream_task = asyncio.create_task(session.run())
+
+            elif session is not None:
+                if message_type == "subscribe":
+                    session.subscribe(_message_symbols(message))
+                elif message_type == "unsubscribe":
+                    session.unsubscribe(_message_symbols(message))
+                elif message_type == "resync":
+                    session.request_resync(_message_symbols(message))
+                elif message_type == "subscribe_options":
+                    try:
+                        expiry = date.fromisoformat(message["expiry"]) if message.get("expiry") else None
+                    except (TypeError, ValueError):
+                        await session.send({"type": "error", "message": f"Invalid expiry: {message.get('expiry')!r}"})
+                        continue
+                    session.subscribe_options(message.get("symbol") or "BANKNIFTY", expiry)
+                elif message_type == "unsubscribe_options":
+                    session.unsubscribe_options(message.get("symbol") or "BANKNIFTY")
+                else:
+                    await session.send({"type": "error", "message": f"Unknown message type: {message_type}"})
+
+            elif message_type == "subscribe":
                 symbol = message.get("symbol")
                 if symbol:
                     # Start streaming data for this symbol
@@ -464,9 +688,12 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
         manager.disconnect(websocket)
+    finally:
+        if stream_task is not None:
+            stream_task.cancel()
 
 async def stream_symbol_data(websocket: WebSocket, symbol: str):
-    """Stream real-time data for a specific symbol"""
+    """Stream real-time data for a specific symbol (v1 protocol, full quotes)"""
     try:
         while True:
             # Get latest quote
@@ -480,7 +707,7 @@ async def stream_symbol_data(websocket: WebSocket, symbol: str):
             }))
             
             # Wait before next update
-            await asyncio.sleep(5)  # Update every 5 seconds
+            await asyncio.sleep(WS_UPDATE_INTERVAL)
             
     except Exception as e:
         logger.error(f"Error streaming data for {symbol}: {str(e)}")
@@ -6,8 +6,16 @@ Test script for BankNifty Analytics Backend
 import asyncio
 import aiohttp
 import json
+import math
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+from indicators import IndicatorCache, compute_indicators
+from main import QuoteStreamSession
+from options_analytics import black_scholes_price, implied_volatility, norm_cdf, calculate_max_pain
+
 # Test configuration
 BASE_URL = "http://localhost:8000"
 TEST_SYMBOLS = ["BANKNIFTY", "NIFTY", "TCS"]
@@ -85,13 +93,14 @@ async def test_technical_indicators(session, symbol):
     """Test technical indicators endpoint"""
     print(f"🧮 Testing technical indicators for {symbol}...")
     try:
-        payload = {"symbol": symbol, "period": "1mo"}
+        payload = {"symbol": symbol, "period": "1mo", "interval": "1d"}
         async with session.post(f"{BASE_URL}/api/technical-indicators", json=payload) as response:
             if response.status == 200:
                 data = await response.json()
                 print(f"✅ Technical indicators for {symbol}:")
                 print(f"   RSI: {data.get('rsi', 'N/A')}")
-                print(f"   MACD: {data.get('macd', 'N/A')}")
+                print(f"   MACD: {data.get('macd', 'N/A')} (signal {data.get('macdSignal', 'N/A')})")
+                print(f"   ADX: {data.get('adx', 'N/A')}")
                 print(f"   ATR: {data.get('atr', 'N/A')}")
                 return True
             else:
@@ -101,6 +110,213 @@ async def test_technical_indicators(session, symbol):
         print(f"❌ Technical indicators error for {symbol}: {e}")
         return False
 
+async def test_options_analytics(session):
+    """Test options analytics endpoint"""
+    print("🎯 Testing options analytics for BANKNIFTY...")
+    try:
+        payload = {"symbol": "BANKNIFTY"}
+        async with session.post(f"{BASE_URL}/api/options/analytics", json=payload) as response:
+            if response.status == 200:
+                data = await response.json()
+                print(f"✅ Options analytics: {len(data.get('contracts', []))} contracts, spot ₹{data.get('spot', 'N/A')}")
+                print(f"   Max pain: {data.get('maxPain', 'N/A')}")
+                return True
+            else:
+                print(f"❌ Options analytics failed: {response.status}")
+                return False
+    except Exception as e:
+        print(f"❌ Options analytics error: {e}")
+        return False
+
+async def test_implied_volatility_roundtrip():
+    """Test IV solver recovers sigma from Black-Scholes prices (offline)"""
+    print("🧮 Testing implied volatility round trip...")
+    try:
+        spot = 45250.0
+        strikes = np.array([45200.0, 45300.0, 45700.0, 44800.0, 46500.0, 44000.0])
+        is_call = np.array([True, False, True, False, True, False])
+        time_to_expiry = np.array([7, 7, 14, 14, 30, 30]) / 365.0
+        sigma = np.array([0.12, 0.13, 0.15, 0.16, 0.18, 0.22])
+
+        prices = black_scholes_price(spot, strikes, time_to_expiry, 0.065, sigma, is_call)
+        solved = implied_volatility(prices, spot, strikes, time_to_expiry, 0.065, is_call)
+        error = np.max(np.abs(solved - sigma))
+        if error < 1e-5:
+            print(f"✅ IV round trip: max error {error:.2e}")
+            return True
+        else:
+            print(f"❌ IV round trip: max error {error:.2e}, solved {solved}")
+            return False
+    except Exception as e:
+        print(f"❌ IV round trip error: {e}")
+        return False
+
+async def test_norm_cdf():
+    """Test vectorized normal CDF against math.erfc (offline)"""
+    print("🧮 Testing normal CDF...")
+    try:
+        x = np.linspace(-40, 40, 8001)
+        expected = np.array([0.5 * math.erfc(-value / math.sqrt(2)) for value in x])
+        error = np.max(np.abs(norm_cdf(x) - expected))
+        if error < 1e-14:
+            print(f"✅ Normal CDF: max error {error:.2e}")
+            return True
+        else:
+            print(f"❌ Normal CDF: max error {error:.2e}")
+            return False
+    except Exception as e:
+        print(f"❌ Normal CDF error: {e}")
+        return False
+
+async def test_max_pain():
+    """Test max pain on a hand-built 3-strike chain (offline)"""
+    print("🧮 Testing max pain...")
+    try:
+        # Writers pay 2100 at 100, 2000 at 110 and 2100 at 120
+        strikes = np.array([100.0, 110.0, 110.0, 120.0])
+        is_call = np.array([True, True, False, False])
+        open_interest = np.array([100, 10, 10, 100])
+        max_pain = calculate_max_pain(strikes, is_call, open_interest)
+        if max_pain == 110.0:
+            print(f"✅ Max pain: {max_pain}")
+            return True
+        else:
+            print(f"❌ Max pain: expected 110.0, got {max_pain}")
+            return False
+    except Exception as e:
+        print(f"❌ Max pain error: {e}")
+        return False
+
+async def test_quote_stream_frames():
+    """Test v2 frame building: snapshots, deltas, removals, resync and seq (offline)"""
+    print("🔌 Testing quote stream frame building...")
+    try:
+        stream = QuoteStreamSession(websocket=None)
+        stream.subscribe(["BANKNIFTY", "NIFTY"])
+        banknifty = {"symbol": "BANKNIFTY", "currentPrice": 45250.0, "currency": "INR", "bid": 45249.0, "timestamp": "t1"}
+        nifty = {"symbol": "NIFTY", "currentPrice": 22000.0, "currency": "INR", "timestamp": "t1"}
+        checks = []
+
+        first = stream.build_frame([banknifty, nifty])
+        checks.append(("snapshots on first frame", first["seq"] == 1 and set(first["snapshots"]) == {"BANKNIFTY", "NIFTY"}))
+        checks.append(("timestamp moved to frame", "timestamp" not in first["snapshots"]["NIFTY"] and "timestamp" in first))
+
+        unchanged = stream.build_frame([{**banknifty, "timestamp": "t2"}, {**nifty, "timestamp": "t2"}])
+        checks.append(("no frame when only timestamp changed", unchanged is None))
+
+        moved = {key: value for key, value in banknifty.items() if key != "bid"}
+        moved["currentPrice"] = 45300.0
+        second = stream.build_frame([moved, nifty])
+        checks.append(("seq only counts sent frames", second["seq"] == 2))
+        checks.append(("field-level delta", second.get("deltas") == {"BANKNIFTY": {"currentPrice": 45300.0}}))
+        checks.append(("removed field", second.get("removed") == {"BANKNIFTY": ["bid"]}))
+
+        stream.request_resync(["NIFTY"])
+        resync = stream.build_frame([moved, {**nifty, "currentPrice": 22010.0}])
+        checks.append(("resync sends snapshot", resync["seq"] == 3 and "NIFTY" in resync.get("snapshots", {}) and "deltas" not in resync))
+
+        # NIFTY is unsubscribed while its quote is being fetched
+        stream.unsubscribe(["NIFTY"])
+        after = stream.build_frame([{**moved, "currentPrice": 45310.0}, {**nifty, "currentPrice": 22020.0}])
+        checks.append(("unsubscribed symbol skipped", set(after.get("deltas", {})) == {"BANKNIFTY"} and "snapshots" not in after))
+
+        failed = [name for name, passed in checks if not passed]
+        if not failed:
+            print(f"✅ Quote stream frames: {len(checks)} checks passed")
+            return True
+        else:
+            print(f"❌ Quote stream frames failed: {', '.join(failed)}")
+            return False
+    except Exception as e:
+        print(f"❌ Quote stream frames error: {e}")
+        return False
+
+def _seeded_ohlcv(bars=300):
+    """Fixed random OHLCV frame for offline indicator checks"""
+    rng = np.random.default_rng(42)
+    close = 45000 + np.cumsum(rng.normal(0, 50, bars))
+    return pd.DataFrame({
+        "Open": close + rng.normal(0, 10, bars),
+        "High": close + rng.uniform(0, 60, bars),
+        "Low": close - rng.uniform(0, 60, bars),
+        "Close": close,
+        "Volume": rng.integers(100000, 1000000, bars).astype(float)
+    }, index=pd.date_range("2024-01-01 09:15", periods=bars, freq="5min"))
+
+async def test_indicator_series():
+    """Test indicator series against pandas reference calculations (offline)"""
+    print("🧮 Testing indicator series against pandas...")
+    try:
+        hist = _seeded_ohlcv()
+        series = compute_indicators(hist)
+        close, high, low = hist["Close"], hist["High"], hist["Low"]
+
+        fast = close.ewm(span=12, adjust=False).mean()
+        slow = close.ewm(span=26, adjust=False).mean()
+        macd = fast - slow
+        signal = macd.ewm(span=9, adjust=False).mean()
+
+        middle = close.rolling(20).mean()
+        std = close.rolling(20).std()
+
+        lowest, highest = low.rolling(14).min(), high.rolling(14).max()
+        stoch_k = 100 * (close - lowest) / (highest - lowest)
+
+        change = close.diff()
+        gains = change.where(change > 0, 0).rolling(14).mean()
+        losses = (-change.where(change < 0, 0)).rolling(14).mean()
+        rsi = (100 - 100 / (1 + gains / losses)).iloc[14:]
+
+        obv = (np.sign(change.fillna(0)) * hist["Volume"]).cumsum()
+
+        expected = {
+            "macd": macd, "macdSignal": signal, "macdHistogram": macd - signal,
+            "bollingerUpper": middle + 2 * std, "bollingerMiddle": middle, "bollingerLower": middle - 2 * std,
+            "stochK": stoch_k, "stochD": stoch_k.rolling(3).mean(),
+            "obv": obv
+        }
+        errors = {name: np.nanmax(np.abs(series[name] - reference.to_numpy())) for name, reference in expected.items()}
+        errors["rsi"] = np.nanmax(np.abs(series["rsi"][14:] - rsi.to_numpy()))
+        # Warm-up points must stay NaN rather than being filled with guesses
+        warmup_ok = np.isnan(series["rsi"][:14]).all() and np.isnan(series["bollingerMiddle"][:19]).all()
+
+        worst = max(errors, key=errors.get)
+        if errors[worst] < 1e-8 and warmup_ok:
+            print(f"✅ Indicator series: max error {errors[worst]:.2e} ({worst})")
+            return True
+        else:
+            print(f"❌ Indicator series: max error {errors[worst]:.2e} ({worst}), warm-up NaN {warmup_ok}")
+            return False
+    except Exception as e:
+        print(f"❌ Indicator series error: {e}")
+        return False
+
+async def test_indicator_cache():
+    """Test indicator payload memoization hits and misses (offline)"""
+    print("🧮 Testing indicator cache...")
+    try:
+        cache = IndicatorCache()
+        hist = _seeded_ohlcv()
+        first = cache.get_payload("BANKNIFTY", "5m", hist)
+        second = cache.get_payload("BANKNIFTY", "5m", hist.copy())
+        hit_ok = cache.hits == 1 and cache.misses == 1 and second is first
+
+        # The forming last bar updates its close, so the result must be recomputed
+        updated = hist.copy()
+        updated.iloc[-1, updated.columns.get_loc("Close")] += 5.0
+        cache.get_payload("BANKNIFTY", "5m", updated)
+        miss_ok = cache.hits == 1 and cache.misses == 2
+
+        if hit_ok and miss_ok:
+            print(f"✅ Indicator cache: {cache.hits} hit, {cache.misses} misses")
+            return True
+        else:
+            print(f"❌ Indicator cache: {cache.hits} hits, {cache.misses} misses")
+            return False
+    except Exception as e:
+        print(f"❌ Indicator cache error: {e}")
+        return False
+
 async def test_search_endpoint(session):
     """Test search endpoint"""
     print("🔍 Testing search endpoint...")
@@ -118,6 +334,31 @@ async def test_search_endpoint(session):
         print(f"❌ Search error: {e}")
         return False
 
+async def test_websocket_delta_stream(session):
+    """Test v2 delta-encoded WebSocket quote stream"""
+    print("🔌 Testing v2 WebSocket quote stream...")
+    try:
+        ws_url = BASE_URL.replace("http", "ws", 1) + "/ws"
+        async with session.ws_connect(ws_url) as ws:
+            await ws.send_json({"type": "hello", "protocol": 2, "encoding": "json"})
+            hello = await ws.receive_json(timeout=10)
+            if hello.get("protocol") != 2:
+                print(f"❌ Protocol negotiation failed: {hello}")
+                return False
+
+            await ws.send_json({"type": "subscribe", "symbols": TEST_SYMBOLS})
+            frame = await ws.receive_json(timeout=60)
+            snapshots = frame.get("snapshots", {})
+            if frame.get("type") == "quote_batch" and frame.get("seq") == 1 and len(snapshots) == len(TEST_SYMBOLS):
+                print(f"✅ Quote stream: {len(snapshots)} snapshots in first frame")
+                return True
+            else:
+                print(f"❌ Unexpected first frame: {frame}")
+                return False
+    except Exception as e:
+        print(f"❌ WebSocket stream error: {e}")
+        return False
+
 async def run_all_tests():
     """Run all tests"""
     print("🚀 Starting BankNifty Analytics Backend Tests")
@@ -128,9 +369,17 @@ async def run_all_tests():
     
     async with aiohttp.ClientSession() as session:
         tests = [
+            ("Implied Volatility", test_implied_volatility_roundtrip()),
+            ("Normal CDF", test_norm_cdf()),
+            ("Max Pain", test_max_pain()),
+            ("Quote Stream Frames", test_quote_stream_frames()),
+            ("Indicator Series", test_indicator_series()),
+            ("Indicator Cache", test_indicator_cache()),
             ("Health Check", test_health_check(session)),
             ("Multiple Quotes", test_multiple_quotes(session)),
             ("Search", test_search_endpoint(session)),
+            ("Options Analytics", test_options_analytics(session)),
+            ("WebSocket Delta Stream", test_websocket_delta_stream(session)),
         ]
         
         # Add individual symbol tests
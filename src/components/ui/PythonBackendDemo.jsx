@@ -279,15 +279,15 @@ const PythonBackendDemo = () => {
             <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
               <div>
                 <div className="text-sm text-muted-foreground">RSI</div>
-                <div className="text-lg font-bold text-primary">{indicators.rsi}</div>
+                <div className="text-lg font-bold text-primary">{indicators.rsi ?? 'N/A'}</div>
               </div>
               <div>
                 <div className="text-sm text-muted-foreground">MACD</div>
-                <div className="text-lg font-bold text-primary">{indicators.macd}</div>
+                <div className="text-lg font-bold text-primary">{indicators.macd ?? 'N/A'}</div>
               </div>
               <div>
                 <div className="text-sm text-muted-foreground">ATR</div>
-                <div className="text-lg font-bold text-primary">{indicators.atr}</div>
+                <div className="text-lg font-bold text-primary">{indicators.atr ?? 'N/A'}</div>
               </div>
               <div>
                 <div className="text-sm text-muted-foreground">Volume</div>
@@ -90,11 +90,12 @@ class PythonBackendService {
   }
 
   // Get technical indicators
-  async getTechnicalIndicators(symbol, period = '1mo') {
+  async getTechnicalIndicators(symbol, period = '1mo', interval = '1d') {
     try {
       const response = await this.api.post('/api/technical-indicators', {
         symbol,
         period,
+        interval,
       });
       return response.data;
     } catch (error) {
@@ -103,6 +104,20 @@ class PythonBackendService {
     }
     }
 
+  // Get options analytics (IV, Greeks, max pain, IV surface)
+  async getOptionsAnalytics(symbol = 'BANKNIFTY', expiry = null) {
+    try {
+      const response = await this.api.post('/api/options/analytics', {
+        symbol,
+        expiry,
+      });
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching options analytics for ${symbol}:`, error);
+      throw error;
+    }
+  }
+
   // Search for symbols
   async searchSymbols(query) {
     try {
@@ -157,6 +172,83 @@ class PythonBackendService {
     }
   }
 
+  // Delta-encoded quote stream (v2 protocol) for multiple symbols.
+  // onQuotes receives the merged quote state for every symbol touched by a frame.
+  createQuoteStream(symbols, onQuotes, onError, onClose) {
+    try {
+      const httpBase = (process.env.REACT_APP_BACKEND_URL || 'http://localhost:8000').replace(/\/$/, '');
+      const isHttps = (typeof location !== 'undefined' && location.protocol === 'https:') || /^https:/i.test(httpBase);
+      const wsBase = httpBase.replace(/^http(s)?:/i, isHttps ? 'wss:' : 'ws:');
+      const ws = new WebSocket(`${wsBase}/ws`);
+      const quotes = {};
+      let lastSeq = 0;
+
+      ws.onopen = () => {
+        console.log('🔌 Quote stream connected');
+        ws.send(JSON.stringify({ type: 'hello', protocol: 2, encoding: 'json' }));
+        ws.send(JSON.stringify({ type: 'subscribe', symbols }));
+      };
+
+      ws.onmessage = (event) => {
+        try {
+          const frame = JSON.parse(event.data);
+          if (frame.type === 'error') {
+            onError?.(new Error(frame.message));
+            return;
+          }
+          if (frame.type !== 'quote_batch') {
+            return;
+          }
+
+          // A gap in sequence numbers means a frame was missed; ask for fresh snapshots
+          if (lastSeq && frame.seq !== lastSeq + 1) {
+            ws.send(JSON.stringify({ type: 'resync' }));
+          }
+          lastSeq = frame.seq;
+
+          const updated = {};
+          Object.entries(frame.snapshots || {}).forEach(([symbol, snapshot]) => {
+            quotes[symbol] = { ...snapshot };
+            updated[symbol] = quotes[symbol];
+          });
+          Object.entries(frame.deltas || {}).forEach(([symbol, delta]) => {
+            quotes[symbol] = { ...quotes[symbol], ...delta };
+            updated[symbol] = quotes[symbol];
+          });
+          Object.entries(frame.removed || {}).forEach(([symbol, fields]) => {
+            fields.forEach(field => delete quotes[symbol]?.[field]);
+            updated[symbol] = quotes[symbol];
+          });
+
+          Object.values(updated).forEach(quote => {
+            if (quote) {
+              quote.timestamp = frame.timestamp;
+            }
+          });
+
+          onQuotes(updated);
+        } catch (error) {
+          console.error('Error parsing quote stream frame:', error);
+        }
+      };
+
+      ws.onerror = (error) => {
+        console.error('Quote stream error:', error);
+        onError?.(error);
+      };
+
+      ws.onclose = () => {
+        console.log('🔌 Quote stream disconnected');
+        onClose?.();
+      };
+
+      return ws;
+    } catch (error) {
+      console.error('Error creating quote stream:', error);
+      throw error;
+    }
+  }
+
   // Batch operations for multiple symbols
   async getBatchData(symbols, dataTypes = ['quote', 'chart', 'indicators']) {
     try {